@@ -1,6 +1,6 @@
-from langchain.agents import Tool, initialize_agent
-from langchain.agents.agent_types import AgentType
-from langchain.memory import ConversationBufferMemory
+import asyncio
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from app.llm_define import OllamaLLM
 from app.llm_define import HuggingFaceChatLLM
@@ -12,6 +12,59 @@ import os
 load_dotenv()
 
 
+class ToolCallingAgent:
+    """Small agent loop on top of Gemini's native function calling"""
+    def __init__(self, llm, tools, system_prompt, memory, max_iterations=5):
+        self.llm = llm.bind_tools(tools)
+        self.tools = {tool.name: tool for tool in tools}
+        self.system_prompt = system_prompt
+        self.memory = memory
+        self.max_iterations = max_iterations
+
+    async def _run_tool(self, tool_call):
+        tool = self.tools.get(tool_call["name"])
+        print(f"🔧 Calling {tool_call['name']} with {tool_call['args']}")
+        if tool is None:
+            content = f"Error: unknown tool {tool_call['name']}"
+        else:
+            try:
+                content = await tool.ainvoke(tool_call["args"])
+            except Exception as e:
+                content = f"Error running {tool_call['name']}: {str(e)}"
+        return ToolMessage(content=str(content), tool_call_id=tool_call["id"])
+
+    async def _generate(self, messages, on_token=None):
+        if on_token is None:
+            return await self.llm.ainvoke(messages)
+        response = None
+        async for chunk in self.llm.astream(messages):
+            if isinstance(chunk.content, str) and chunk.content:
+                await on_token(chunk.content)
+            response = chunk if response is None else response + chunk
+        return response
+
+    async def ainvoke(self, inputs, on_token=None):
+        """Answer inputs["input"], calling tools as requested; on_token receives streamed text"""
+        user_input = inputs["input"]
+        history = self.memory.load_memory_variables({})["chat_history"]
+        messages = [SystemMessage(content=self.system_prompt), *history, HumanMessage(content=user_input)]
+
+        output = "Sorry, I could not finish answering within the allowed number of steps."
+        for _ in range(self.max_iterations):
+            response = await self._generate(messages, on_token)
+            if response is None:
+                break
+            messages.append(response)
+            if not response.tool_calls:
+                output = response.content
+                break
+            # Independent calls run concurrently; gather keeps results in tool_call_id order
+            messages.extend(await asyncio.gather(*(self._run_tool(call) for call in response.tool_calls)))
+
+        self.memory.save_context({"input": user_input}, {"output": output})
+        return {"input": user_input, "output": output}
+
+
 # Initialize your RAG components
 def initialize_rag_agent():
     """Initialize the RAG agent with ChromaDB and tools"""
@@ -44,24 +97,17 @@ def initialize_rag_agent():
         #     tools.append(retriver_tool)
             
         
-        memory = ConversationBufferMemory(memory_key="chat_history")
+        # Keep only the last few turns so prompt size stays bounded
+        memory = ConversationBufferWindowMemory(memory_key="chat_history", k=6, return_messages=True)
 
         # Custom prompt
         custom_prompt = """You are a helpful assistant who can search through website content and answer questions and greet the user for greeting messages .
                 You have access to a database of crawled website content. Use the SearchWebsite tool for simple searches and provide detial answer . 
                 in your answer provide detial answer and provide the source of that answer like the url of the site .
-                Always explain your thinking, then choose an action from the available tools.
+                When several independent tool calls are needed, request them together in one step.
                 """
-                
-        agent = initialize_agent(
-                    tools=tools,
-                    llm=llm,
-                    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-                    verbose=True,
-                    agent_kwargs={"prefix": custom_prompt},
-                    memory=memory,
-                    handle_parsing_errors=True
-                )
+
+        agent = ToolCallingAgent(llm, tools, custom_prompt, memory)
         
         return agent, chroma_indexer
     
@@ -1,37 +1,272 @@
 import os
 import json
+import asyncio
+import time
 import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+import numpy as np
+import torch
+import xxhash
+from transformers import AutoTokenizer
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from sentence_transformers import CrossEncoder
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.agents import Tool, initialize_agent
 from langchain.agents.agent_types import AgentType
 from langchain.chains import RetrievalQA
 from dotenv import load_dotenv
+from app.embeddings_onnx import ONNXEmbeddings, DEFAULT_MODEL_DIR
+
+try:
+    import intel_extension_for_pytorch as ipex
+except ImportError:
+    ipex = None
+
+torch.set_num_threads(os.cpu_count() or 1)
+
+# bf16 only pays off on CPUs with native support (AVX512-BF16 / AMX)
+_USE_BF16 = torch.backends.mkldnn.is_available() and bool(
+    getattr(torch.ops.mkldnn, "_is_mkldnn_bf16_supported", lambda: False)()
+)
+
+# HNSW settings tuned for MiniLM's 384-d normalised vectors. search_ef stays
+# well above the largest k we query so recall does not collapse on big indexes.
+HNSW_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 32,
+    "hnsw:search_ef": 64
+}
+
+# Anchored to this package so the index is found regardless of the working directory
+CHROMA_DIR = os.path.join(os.path.dirname(__file__), "chroma_db")
+
+# Chunks embedded and written per step, so large builds stay incremental
+INDEX_BATCH_SIZE = 64
+
+# Hashes of already-indexed chunk texts mapped to the id of the stored copy,
+# kept inside the Chroma directory
+SEEN_HASHES_FILE = "chunk_hashes.json"
+
+# Chunks store small URL / site-type ids; this file maps them back to strings
+LOOKUP_TABLES_FILE = "url_table.json"
+
+# Chunks shorter than this are whitespace or boilerplate fragments, not worth a vector
+MIN_CHUNK_CHARS = 40
+
+# Two-stage retrieval: cheap ANN candidates, then cross-encoder rerank with MMR diversity
+RERANK_FETCH_K = 40
+RERANK_TOP_K = 4
+MMR_DIVERSITY = 0.5
+
+@lru_cache(maxsize=1)
+def _get_reranker():
+    return CrossEncoder("BAAI/bge-reranker-base", max_length=512)
+
+def _mmr_select(scores, embeddings, k, diversity=MMR_DIVERSITY):
+    """Greedily picks the best-scoring candidate, penalising similarity to earlier picks; scores must be in [0, 1]"""
+    embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    remaining = np.ones(len(scores), dtype=bool)
+    max_similarity = np.zeros(len(scores), dtype=np.float32)
+    selected = []
+    for _ in range(min(k, len(scores))):
+        adjusted = np.where(remaining, scores - diversity * max_similarity, -np.inf)
+        best = int(np.argmax(adjusted))
+        selected.append(best)
+        remaining[best] = False
+        max_similarity = np.maximum(max_similarity, embeddings @ embeddings[best])
+    return selected
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    return AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
+
+class TorchEmbeddings(HuggingFaceEmbeddings):
+    """HuggingFaceEmbeddings that encodes under inference_mode and bf16 autocast"""
+    def embed_documents(self, texts):
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=_USE_BF16):
+            return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=_USE_BF16):
+            return super().embed_query(text)
+
+def _build_torch_embeddings():
+    """PyTorch fallback for when the ONNX model is unavailable"""
+    embeddings = TorchEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"batch_size": 64, "normalize_embeddings": True}
+    )
+    transformer_module = embeddings._client[0]
+    eager_model = transformer_module.auto_model.eval()
+    try:
+        if ipex is not None:
+            eager_model = ipex.optimize(eager_model, dtype=torch.bfloat16 if _USE_BF16 else torch.float32)
+        transformer_module.auto_model = torch.compile(eager_model, mode="reduce-overhead", dynamic=True)
+        # Compilation is lazy, so warm the graph now rather than on the first user query
+        embeddings.embed_documents(["warm up"] * 8)
+    except Exception as e:
+        print(f"⚠️ torch.compile unavailable, using eager PyTorch: {e}")
+        transformer_module.auto_model = eager_model
+    return embeddings
+
+@lru_cache(maxsize=1)
+def _get_embedding_model():
+    """Loads the embedding model once per process and shares it across indexers"""
+    try:
+        return ONNXEmbeddings(model_dir=os.getenv("ONNX_MODEL_DIR", DEFAULT_MODEL_DIR))
+    except Exception as e:
+        print(f"⚠️ ONNX embeddings unavailable, falling back to PyTorch: {e}")
+        return _build_torch_embeddings()
+
+class RerankRetriever(BaseRetriever):
+    """Retriever backed by ChromaIndexer.search_and_rerank"""
+    indexer: Any
+    k: int = RERANK_TOP_K
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return [doc for doc, _ in self.indexer.search_and_rerank(query, k=self.k)]
+
+class LookupTable:
+    """Interns repeated strings (URLs, site types) as small ints"""
+    def __init__(self, values=None):
+        self.values = list(values or [])
+        self._ids = {value: i for i, value in enumerate(self.values)}
+        # Builds run in to_thread workers, so concurrent builds must not hand out the same id
+        self._lock = threading.Lock()
+
+    def id_for(self, value: str) -> int:
+        with self._lock:
+            if value not in self._ids:
+                self._ids[value] = len(self.values)
+                self.values.append(value)
+            return self._ids[value]
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return list(self.values)
+
+    def value_for(self, value_id: int, default: str = "") -> str:
+        return self.values[value_id] if 0 <= value_id < len(self.values) else default
+
+class QueryCache:
+    """Thread-safe LRU cache with TTL for query embeddings"""
+    def __init__(self, max_size=2000, ttl_seconds=600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    def get(self, query: str):
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, query: str, value):
+        key = self._key(query)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
 
 # Your existing ChromaIndexer class with some modifications
 class ChromaIndexer:
-    def __init__(self, json_data=None, persist_dir="chroma_db"):
+    def __init__(self, json_data=None, persist_dir=CHROMA_DIR):
         self.json_data = json_data
         self.persist_dir = persist_dir
-        self.embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        self.embedding_model = _get_embedding_model()
         self.vectorstore = None
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=10,
-            separators=["\n\n", "\n", " ", ""]
+        self._qcache = QueryCache()
+        self._retriever_cache = {}
+        self._qa_cache = {}
+        self._seen_hashes = self._load_seen_hashes()
+        self._urls, self._site_types = self._load_lookup_tables()
+        self._tables_save_lock = threading.Lock()
+        # Token-based chunks sized to MiniLM's 256-token window ([CLS]/[SEP] take two)
+        self.text_splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+            tokenizer=_get_tokenizer(),
+            chunk_size=254,
+            chunk_overlap=32,
+            separators=["\n\n", "\n", ". ", " ", ""]
         )
         
         # Load existing vectorstore if it exists
         if os.path.exists(self.persist_dir):
             self.vectorstore = Chroma(
                 persist_directory=self.persist_dir,
-                embedding_function=self.embedding_model
+                embedding_function=self.embedding_model,
+                collection_metadata=HNSW_COLLECTION_METADATA
             )
 
     def build_index_from_data(self, json_data=None):
         """Build index from JSON data variable"""
+        doc_chunks, new_hashes, indexed_dups = self._prepare_chunks(json_data)
+        self._record_indexed_dups(indexed_dups)
+        if not doc_chunks:
+            print("ℹ️ No new content to index.")
+            return
+
+        for start in range(0, len(doc_chunks), INDEX_BATCH_SIZE):
+            self._write_chunks(doc_chunks[start:start + INDEX_BATCH_SIZE])
+
+        self._finish_build(doc_chunks, new_hashes)
+
+    async def abuild_index_from_data(self, json_data=None):
+        """Build index without blocking the event loop, writing one batch at a time"""
+        doc_chunks, new_hashes, indexed_dups = await asyncio.to_thread(self._prepare_chunks, json_data)
+        await asyncio.to_thread(self._record_indexed_dups, indexed_dups)
+        if not doc_chunks:
+            print("ℹ️ No new content to index.")
+            return
+
+        for start in range(0, len(doc_chunks), INDEX_BATCH_SIZE):
+            await asyncio.to_thread(self._write_chunks, doc_chunks[start:start + INDEX_BATCH_SIZE])
+            await asyncio.sleep(0)
+
+        self._finish_build(doc_chunks, new_hashes)
+
+    def _prepare_chunks(self, json_data=None):
+        """Validates the JSON entries and returns the deduplicated chunks to embed"""
         if json_data is None:
             json_data = self.json_data
         
@@ -57,50 +292,278 @@ class ChromaIndexer:
             all_documents.append(document)
 
         # Split using the new method
-        doc_chunks = self.text_splitter.split_documents(all_documents)
+        doc_chunks = [
+            chunk for chunk in self.text_splitter.split_documents(all_documents)
+            if len(chunk.page_content.strip()) >= MIN_CHUNK_CHARS
+        ]
+        self._assign_chunk_ids(doc_chunks)
+        return self._dedupe_chunks(doc_chunks)
+
+    @staticmethod
+    def _assign_chunk_ids(doc_chunks):
+        """Gives chunks deterministic IDs so re-indexing a page overwrites instead of appending"""
+        # Position is counted per URL so one page changing does not shift other pages' IDs
+        positions = {}
+        for chunk in doc_chunks:
+            url = chunk.metadata.get("url", "")
+            position = positions.get(url, 0)
+            positions[url] = position + 1
+            chunk.id = xxhash.xxh64(f"{url}|{position}|{chunk.page_content}").hexdigest()
 
-        # Create new vectorstore from documents
-        self.vectorstore = Chroma.from_documents(
-            documents=doc_chunks,
-            embedding=self.embedding_model,
-            persist_directory=self.persist_dir
+    def _write_chunks(self, doc_chunks):
+        """Embeds one batch of chunks and upserts it into the collection"""
+        texts = [d.page_content for d in doc_chunks]
+        metadatas = [self._compact_metadata(d.metadata) for d in doc_chunks]
+        # Persist the tables first so every stored u/t id resolves even if a later batch fails
+        self._save_lookup_tables()
+        embeddings = self._embed_documents(texts)
+
+        # Write precomputed vectors directly so Chroma does not embed again
+        if self.vectorstore is None:
+            self.vectorstore = Chroma(
+                persist_directory=self.persist_dir,
+                embedding_function=self.embedding_model,
+                collection_metadata=HNSW_COLLECTION_METADATA
+            )
+        self.vectorstore._collection.upsert(
+            ids=[d.id for d in doc_chunks],
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas
         )
 
+    def _finish_build(self, doc_chunks, new_hashes):
+        self._seen_hashes.update(new_hashes)
+        self._save_seen_hashes()
+        self._save_lookup_tables()
+        self._clear_caches()
         print(f"✅ Successfully pushed {len(doc_chunks)} chunks to ChromaDB.")
 
+    def _load_lookup_tables(self):
+        path = os.path.join(self.persist_dir, LOOKUP_TABLES_FILE)
+        if not os.path.exists(path):
+            return LookupTable(), LookupTable()
+        with open(path) as f:
+            tables = json.load(f)
+        return LookupTable(tables.get("url")), LookupTable(tables.get("site_type"))
+
+    def _save_lookup_tables(self):
+        path = os.path.join(self.persist_dir, LOOKUP_TABLES_FILE)
+        with self._tables_save_lock:
+            tables = {"url": self._urls.snapshot(), "site_type": self._site_types.snapshot()}
+            os.makedirs(self.persist_dir, exist_ok=True)
+            # Write then rename so a crash mid-write never leaves a truncated table
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(tables, f)
+            os.replace(tmp_path, path)
+
+    def _compact_metadata(self, metadata):
+        """Stores URL / site type as table ids instead of repeating the strings per chunk"""
+        compact = {
+            "u": self._urls.id_for(metadata.get("url", "")),
+            "t": self._site_types.id_for(metadata.get("site_type", "unknown"))
+        }
+        if metadata.get("dup_urls"):
+            compact["d"] = " ".join(str(self._urls.id_for(url)) for url in metadata["dup_urls"].split())
+        return compact
+
+    def _expand_metadata(self, metadata):
+        """Resolves compact metadata back to url / site_type / dup_urls strings"""
+        metadata = metadata or {}
+        if "u" not in metadata:
+            # Chunks indexed before compact metadata already carry the strings
+            return metadata
+        expanded = {
+            "url": self._urls.value_for(metadata["u"]),
+            "site_type": self._site_types.value_for(metadata.get("t", -1), "unknown")
+        }
+        if metadata.get("d"):
+            expanded["dup_urls"] = " ".join(self._urls.value_for(int(i)) for i in metadata["d"].split())
+        return expanded
+
+    def _load_seen_hashes(self):
+        path = os.path.join(self.persist_dir, SEEN_HASHES_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            seen = json.load(f)
+        # Older files are a bare hash list with no chunk ids to update
+        return dict.fromkeys(seen) if isinstance(seen, list) else seen
+
+    def _save_seen_hashes(self):
+        path = os.path.join(self.persist_dir, SEEN_HASHES_FILE)
+        with open(path, "w") as f:
+            json.dump(dict(sorted(self._seen_hashes.items())), f)
+
+    def _dedupe_chunks(self, doc_chunks):
+        """Drops repeated chunks (navbars, footers, ...) so they are embedded only once"""
+        # Later copies only add their URL to the first copy's space-separated
+        # dup_urls; copies of chunks from an earlier build are returned as
+        # {stored chunk id: [urls]} so the stored record can be updated instead
+        unique_chunks = []
+        first_copies = {}
+        indexed_dups = {}
+        for chunk in doc_chunks:
+            digest = xxhash.xxh64(chunk.page_content).hexdigest()
+            if digest in self._seen_hashes:
+                chunk_id = self._seen_hashes[digest]
+                url = chunk.metadata.get("url", "")
+                if chunk_id and url:
+                    indexed_dups.setdefault(chunk_id, []).append(url)
+                continue
+            canonical = first_copies.get(digest)
+            if canonical is None:
+                first_copies[digest] = chunk
+                unique_chunks.append(chunk)
+                continue
+            url = chunk.metadata.get("url", "")
+            dup_urls = canonical.metadata.get("dup_urls", "").split()
+            if url and url != canonical.metadata.get("url") and url not in dup_urls:
+                canonical.metadata["dup_urls"] = " ".join(dup_urls + [url])
+        new_hashes = {digest: chunk.id for digest, chunk in first_copies.items()}
+        return unique_chunks, new_hashes, indexed_dups
+
+    def _record_indexed_dups(self, indexed_dups):
+        """Adds URLs of repeated chunks to dup_urls of copies stored by an earlier build"""
+        if not indexed_dups or self.vectorstore is None:
+            return
+        collection = self.vectorstore._collection
+        stored = collection.get(ids=list(indexed_dups), include=["metadatas"])
+        ids, metadatas = [], []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            if "u" not in (metadata or {}):
+                # Chunks indexed before compact metadata keep their original strings
+                continue
+            dup_ids = metadata.get("d", "").split()
+            for url in indexed_dups[chunk_id]:
+                url_id = str(self._urls.id_for(url))
+                if url_id != str(metadata["u"]) and url_id not in dup_ids:
+                    dup_ids.append(url_id)
+            if dup_ids != metadata.get("d", "").split():
+                ids.append(chunk_id)
+                metadatas.append({**metadata, "d": " ".join(dup_ids)})
+        if ids:
+            self._save_lookup_tables()
+            collection.update(ids=ids, metadatas=metadatas)
+
+    def _embed_documents(self, texts):
+        """Embeds texts in one batched pass, length-sorted to minimise padding"""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_embeddings = self.embedding_model.embed_documents([texts[i] for i in order])
+        embeddings = [None] * len(texts)
+        for position, index in enumerate(order):
+            embeddings[index] = sorted_embeddings[position]
+        return embeddings
+
+    def _clear_caches(self):
+        """Drops everything derived from the current vectorstore"""
+        self._qcache.clear()
+        self._retriever_cache.clear()
+        self._qa_cache.clear()
+
     def get_retriever(self, k=3):
-        """Returns a retriever for the vectorstore"""
+        """Returns a cached retriever for the vectorstore"""
         if self.vectorstore is None:
             raise ValueError("Vectorstore not initialized. Run build_index_from_json() first.")
-        return self.vectorstore.as_retriever(search_kwargs={"k": k})
+        if k not in self._retriever_cache:
+            self._retriever_cache[k] = RerankRetriever(indexer=self, k=k)
+        return self._retriever_cache[k]
+
+    def get_qa_chain(self, llm, k=3):
+        """Returns a cached RetrievalQA chain for the given llm and k"""
+        key = (k, id(llm))
+        if key not in self._qa_cache:
+            self._qa_cache[key] = RetrievalQA.from_chain_type(
+                llm=llm,
+                chain_type="stuff",
+                retriever=self.get_retriever(k=k),
+                return_source_documents=True
+            )
+        return self._qa_cache[key]
+
+    def _embed_query(self, query: str):
+        """Returns the query embedding, reusing cached vectors for repeat queries"""
+        embedding = self._qcache.get(query)
+        if embedding is None:
+            embedding = self.embedding_model.embed_query(query)
+            self._qcache.set(query, embedding)
+        return embedding
 
     def search_with_score(self, query: str, k: int = 3):
         if self.vectorstore is None:
             return []
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        embedding = self._embed_query(query)
+        results = self.vectorstore.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        for doc, _ in results:
+            doc.metadata = self._expand_metadata(doc.metadata)
         return results
 
+    def search_and_rerank(self, query: str, k: int = RERANK_TOP_K, fetch_k: int = RERANK_FETCH_K):
+        """Returns the k best (Document, relevance) pairs after reranking fetch_k ANN candidates"""
+        if self.vectorstore is None:
+            return []
+        results = self.vectorstore._collection.query(
+            query_embeddings=[self._embed_query(query)],
+            n_results=fetch_k,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        texts = results["documents"][0]
+        if not texts:
+            return []
+        metadatas = results["metadatas"][0]
+        embeddings = np.asarray(results["embeddings"][0], dtype=np.float32)
+
+        # One batched cross-encoder pass over all candidates. The reranker returns
+        # raw logits (roughly ±10), so squash them to [0, 1] to match the cosine
+        # penalty in MMR; otherwise the diversity term never changes the picks
+        logits = np.asarray(_get_reranker().predict([(query, text) for text in texts]), dtype=np.float32)
+        scores = 1.0 / (1.0 + np.exp(-logits))
+        return [
+            (Document(page_content=texts[i], metadata=self._expand_metadata(metadatas[i])), float(scores[i]))
+            for i in _mmr_select(scores, embeddings, k)
+        ]
+
     def delete_index(self):
         if os.path.exists(self.persist_dir):
             shutil.rmtree(self.persist_dir)
+            self.vectorstore = None
+            self._seen_hashes = {}
+            self._urls, self._site_types = LookupTable(), LookupTable()
+            self._clear_caches()
             print(f"🗑️ Deleted ChromaDB directory: {self.persist_dir}")
         else:
             print(f"ℹ️ ChromaDB directory does not exist: {self.persist_dir}")
 
+# Limits on what SearchWebsite feeds back into the agent prompt
+SEARCH_MAX_RESULTS = 5
+SEARCH_SNIPPET_CHARS = 400
+SEARCH_TOKEN_BUDGET = 1200
+
 # Create retriever tool functions
 def create_website_search_tool(chroma_indexer):
     """Creates a tool for searching website content"""
     def search_website(query: str) -> str:
         try:
-            results = chroma_indexer.search_with_score(query, k=10)
+            results = chroma_indexer.search_and_rerank(query)
             if not results:
                 return "No relevant information found in the website database."
             
-            formatted_results = []
+            # Results come back best-first, so the first hit per URL is its best one
+            by_url = {}
             for doc, score in results:
-                content = doc.page_content
-                url = doc.metadata.get('url', 'Unknown URL')
-                formatted_results.append(f"Source: {url}\nContent: {content}\nScore: {score:.4f}")
+                by_url.setdefault(doc.metadata.get('url', 'Unknown URL'), (doc, score))
+
+            formatted_results = []
+            used_tokens = 0
+            for url, (doc, score) in list(by_url.items())[:SEARCH_MAX_RESULTS]:
+                content = doc.page_content[:SEARCH_SNIPPET_CHARS]
+                entry = f"Source: {url}\nContent: {content}\nScore: {score:.4f}"
+                # Rough 4-characters-per-token estimate keeps the prompt bounded
+                used_tokens += len(entry) // 4
+                if formatted_results and used_tokens > SEARCH_TOKEN_BUDGET:
+                    break
+                formatted_results.append(entry)
             
             return "\n\n---\n\n".join(formatted_results)
         except Exception as e:
@@ -109,6 +572,7 @@ def create_website_search_tool(chroma_indexer):
     return Tool(
         name="SearchWebsite",
         func=search_website,
+        coroutine=lambda query: asyncio.to_thread(search_website, query),
         description="Search through crawled website content. Use this to find specific information from the analyzed website pages. Input should be a search query about the website content."
     )
 
@@ -116,14 +580,7 @@ def create_retrieval_qa_tool(chroma_indexer, llm):
     """Creates a RetrievalQA tool for more sophisticated Q&A"""
     def qa_search(query: str) -> str:
         try:
-            retriever = chroma_indexer.get_retriever(k=10)
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="stuff",
-                retriever=retriever,
-                return_source_documents=True
-            )
-            
+            qa_chain = chroma_indexer.get_qa_chain(llm, k=RERANK_TOP_K)
             result = qa_chain({"query": query})
             answer = result["result"]
             sources = [doc.metadata.get('url', 'Unknown') for doc in result["source_documents"]]
@@ -135,6 +592,7 @@ def create_retrieval_qa_tool(chroma_indexer, llm):
     return Tool(
         name="WebsiteQA",
         func=qa_search,
+        coroutine=lambda query: asyncio.to_thread(qa_search, query),
         description="Ask questions about the website content and get detailed answers with sources. Use this for complex questions that require reasoning over the website content."
     )
     
@@ -158,9 +616,26 @@ def create_build_index_tool(chroma_indexer):
         except Exception as e:
             return f"❌ Error building index: {str(e)}"
     
+    async def abuild_index_from_json(json_data_str: str) -> str:
+        try:
+            json_data = json.loads(json_data_str)
+            
+            if not isinstance(json_data, list):
+                return "❌ Error: JSON data must be a list of dictionaries."
+            
+            await chroma_indexer.abuild_index_from_data(json_data)
+            
+            return f"✅ Successfully built index from {len(json_data)} entries. Vector database is ready for searching."
+            
+        except json.JSONDecodeError as e:
+            return f"❌ Error parsing JSON: {str(e)}"
+        except Exception as e:
+            return f"❌ Error building index: {str(e)}"
+    
     return Tool(
         name="BuildIndex",
         func=build_index_from_json,
+        coroutine=abuild_index_from_json,
         description="Build vector database index from JSON data. Input should be a JSON string containing a list of dictionaries with 'URL', 'content', and 'site_type' fields. This tool processes the data and creates a searchable vector database."
     )
 
@@ -0,0 +1,71 @@
+import os
+from typing import List
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+from langchain_core.embeddings import Embeddings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(__file__), "onnx_model")
+
+
+def export_quantized_model(model_name: str, save_dir: str):
+    """Export the model to ONNX and apply dynamic int8 quantization"""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    quantizer = ORTQuantizer.from_pretrained(model)
+    quantizer.quantize(
+        save_dir=save_dir,
+        quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    )
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(save_dir)
+    print(f"✅ Exported int8 ONNX model to {save_dir}")
+
+
+class ONNXEmbeddings(Embeddings):
+    """Sentence embeddings from an int8-quantized ONNX export of MiniLM"""
+    def __init__(self, model_name: str = MODEL_NAME, model_dir: str = DEFAULT_MODEL_DIR,
+                 batch_size: int = 64, max_length: int = 256):
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+        if not os.path.exists(model_path):
+            export_quantized_model(model_name, model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = os.cpu_count() or 1
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        inputs = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens, then L2 normalisation (matches sentence-transformers)
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._encode(texts[start:start + self.batch_size]).tolist())
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
@@ -3,9 +3,57 @@
 from langchain.llms.base import LLM
 import ollama
 from typing import Optional, List,Any,Dict
+import asyncio
+import weakref
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from langchain_core.runnables import Runnable
 
+HF_CHAT_API_URL = "https://router.huggingface.co/v1/chat/completions"
+HF_TIMEOUT = (3.05, 60)
+
+# Shared keep-alive session so the TLS handshake is paid once, not per agent turn
+_HF_SESSION = requests.Session()
+_HF_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["POST"])
+    )
+))
+# Same retry policy as the sync session; httpx's transport only retries failed connects
+HF_RETRY_TOTAL = 3
+HF_RETRY_BACKOFF = 0.2
+HF_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# httpx.AsyncClient is bound to the loop it first ran on, so keep one per event loop
+_HF_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _HF_ASYNC_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HF_TIMEOUT[1], connect=HF_TIMEOUT[0]),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            transport=httpx.AsyncHTTPTransport(retries=HF_RETRY_TOTAL)
+        )
+        _HF_ASYNC_CLIENTS[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Close the HF client bound to the running loop, if any."""
+    client = _HF_ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
 
 class HuggingFaceChatLLM(LLM):
     model_name: str
@@ -15,9 +63,7 @@ class HuggingFaceChatLLM(LLM):
     def _llm_type(self) -> str:
         return "huggingface-chat-api"
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        api_url ="https://router.huggingface.co/v1/chat/completions"
-
+    def _build_request(self, prompt: str):
         headers = {
             "Authorization": f"Bearer {self.huggingface_api_token}",
             "Content-Type": "application/json"
@@ -32,8 +78,25 @@ class HuggingFaceChatLLM(LLM):
             "temperature": 0.7,
             "max_tokens": 512
         }
+        return headers, payload
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        headers, payload = self._build_request(prompt)
+        response = _HF_SESSION.post(HF_CHAT_API_URL, headers=headers, json=payload, timeout=HF_TIMEOUT)
+        if response.status_code == 200:
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+        else:
+            raise Exception(f"API call failed: {response.status_code}, {response.text}")
 
-        response = requests.post(api_url, headers=headers, json=payload)
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        headers, payload = self._build_request(prompt)
+        client = _get_async_client()
+        for attempt in range(HF_RETRY_TOTAL + 1):
+            response = await client.post(HF_CHAT_API_URL, headers=headers, json=payload)
+            if response.status_code not in HF_RETRY_STATUSES or attempt == HF_RETRY_TOTAL:
+                break
+            await asyncio.sleep(HF_RETRY_BACKOFF * (2 ** attempt))
         if response.status_code == 200:
             result = response.json()
             return result["choices"][0]["message"]["content"]
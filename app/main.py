@@ -1,12 +1,19 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
 import os
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 from app.agent import initialize_rag_agent
+from app.web_scraper import stream_crawl_and_analyze_website
+from app.llm_define import aclose_async_client
 import json
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 import uuid
+import zlib
+import ijson
 import uvicorn
 from datetime import datetime
 
@@ -21,6 +28,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compress larger HTTP responses such as /crawl results; WebSocket traffic is unaffected
+app.add_middleware(GZipMiddleware, minimum_size=512)
 
 # Global variables
 active_connections: Dict[str, WebSocket] = {}
@@ -28,6 +37,24 @@ chat_history: List[Dict] = []
 
 rag_agent, chroma_indexer = initialize_rag_agent()
 
+# Website entries indexed per Chroma build while streaming an upload
+UPLOAD_BATCH_SIZE = 256
+# Largest upload body accepted, checked against Content-Length and while streaming
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Bounded pool shared by every WebSocket for sync tool work (embedding, Chroma I/O)
+TOOL_WORKERS = 8
+
+
+@app.on_event("startup")
+async def configure_executor():
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=TOOL_WORKERS))
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await aclose_async_client()
+
 
 class ConnectionManager:
     def __init__(self):
@@ -48,78 +75,41 @@ class ConnectionManager:
             await self.active_connections[connection_id].send_text(json.dumps(message))
     
     async def broadcast(self, message: dict):
-        for connection in self.active_connections.values():
-            await connection.send_text(json.dumps(message))
+        payload = json.dumps(message)
+        connections = list(self.active_connections.items())
+        results = await asyncio.gather(
+            *(connection.send_text(payload) for _, connection in connections),
+            return_exceptions=True
+        )
+        for (connection_id, _), result in zip(connections, results):
+            if isinstance(result, Exception):
+                print(f"Dropping connection {connection_id} after failed broadcast: {result}")
+                self.disconnect(connection_id)
 
 manager = ConnectionManager()
 
+# Static assets for the home page; the HTML is read once at startup, the CSS is cached by browsers
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+with open(os.path.join(STATIC_DIR, "index.html"), encoding="utf-8") as f:
+    HOME_PAGE_HTML = f.read()
+
 @app.get("/")
 async def get_home():
     """Simple home page with basic chat interface"""
-    return HTMLResponse(content="""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Website RAG Chat</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 0; padding: 20px; }
-            .container { max-width: 800px; margin: 0 auto; }
-            .chat-container { border: 1px solid #ddd; height: 400px; overflow-y: auto; padding: 10px; margin: 10px 0; }
-            .message { margin: 5px 0; padding: 5px; border-radius: 5px; }
-            .user-message { background: #e3f2fd; text-align: right; }
-            .bot-message { background: #f5f5f5; }
-            .input-container { display: flex; gap: 10px; }
-            input[type="text"] { flex: 1; padding: 10px; border: 1px solid #ddd; border-radius: 5px; }
-            button { padding: 10px 20px; background: #007bff; color: white; border: none; border-radius: 5px; cursor: pointer; }
-            button:hover { background: #0056b3; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Website RAG Chat</h1>
-            <div id="chat-container" class="chat-container"></div>
-            <div class="input-container">
-                <input type="text" id="messageInput" placeholder="Ask me anything about the website..." />
-                <button onclick="sendMessage()">Send</button>
-            </div>
-        </div>
-        
-        <script>
-            const ws = new WebSocket("ws://localhost:8000/ws");
-            const chatContainer = document.getElementById('chat-container');
-            const messageInput = document.getElementById('messageInput');
-            
-            ws.onmessage = function(event) {
-                const data = JSON.parse(event.data);
-                displayMessage(data.message, data.sender);
-            };
-            
-            function displayMessage(message, sender) {
-                const messageDiv = document.createElement('div');
-                messageDiv.className = `message ${sender}-message`;
-                messageDiv.textContent = message;
-                chatContainer.appendChild(messageDiv);
-                chatContainer.scrollTop = chatContainer.scrollHeight;
-            }
-            
-            function sendMessage() {
-                const message = messageInput.value.trim();
-                if (message) {
-                    ws.send(JSON.stringify({type: 'message', message: message}));
-                    displayMessage(message, 'user');
-                    messageInput.value = '';
-                }
-            }
-            
-            messageInput.addEventListener('keypress', function(e) {
-                if (e.key === 'Enter') {
-                    sendMessage();
-                }
-            });
-        </script>
-    </body>
-    </html>
-    """)
+    return HTMLResponse(content=HOME_PAGE_HTML)
+
+async def stream_agent_response(connection_id: str, user_message: str) -> str:
+    """Forward model tokens to the client as they arrive and return the final answer"""
+    async def send_token(delta: str):
+        await manager.send_message(connection_id, {
+            "type": "token",
+            "delta": delta,
+            "sender": "bot"
+        })
+
+    response = await rag_agent.ainvoke({"input": user_message}, on_token=send_token)
+    return response.get('output') or 'Sorry, I could not process your request.'
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -151,13 +141,12 @@ async def websocket_endpoint(websocket: WebSocket):
                             "sender": "bot"
                         })
                         
-                        # Get response from RAG agent
-                        response =  await rag_agent.ainvoke({"input": user_message})
-                        bot_response = response.get('output', 'Sorry, I could not process your request.')
+                        # Stream the RAG agent's answer token by token
+                        bot_response = await stream_agent_response(connection_id, user_message)
                         
-                        # Send bot response
+                        # Send the complete bot response
                         await manager.send_message(connection_id, {
-                            "type": "message",
+                            "type": "done",
                             "message": bot_response,
                             "sender": "bot",
                             "timestamp": datetime.now().isoformat()
@@ -184,6 +173,78 @@ async def health_check():
         "active_connections": len(manager.active_connections)
     }
 
+class RequestBodyReader:
+    """Async file-like view of a request body, as ijson.items_async expects"""
+    def __init__(self, request: Request, max_bytes: int = MAX_UPLOAD_BYTES):
+        self._chunks = request.stream().__aiter__()
+        self._buffer = b""
+        self._remaining = max_bytes
+        self._decompressor = None
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            self._decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+
+    async def read(self, size: int = -1) -> bytes:
+        while not self._buffer:
+            if self._chunks is None:
+                return b""
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._chunks = None
+                chunk = None
+            if self._decompressor:
+                # Never inflate past the cap, so a small gzip bomb can't exhaust memory
+                if chunk is None:
+                    chunk = self._decompressor.flush()
+                else:
+                    chunk = self._decompressor.decompress(chunk, self._remaining + 1)
+                    if self._decompressor.unconsumed_tail:
+                        raise HTTPException(status_code=413, detail="Upload too large")
+            self._buffer = chunk or b""
+            # Chunked uploads carry no Content-Length, so enforce the cap as bytes arrive
+            self._remaining -= len(self._buffer)
+            if self._remaining < 0:
+                raise HTTPException(status_code=413, detail="Upload too large")
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+@app.post("/upload-data-stream")
+async def upload_data_stream(request: Request):
+    """Index a JSON array of website entries as it streams in, without buffering the body"""
+    content_length = request.headers.get("content-length")
+    if content_length and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    if chroma_indexer is None:
+        raise HTTPException(status_code=503, detail="Indexer is not available")
+
+    entry_count = 0
+    batch = []
+    try:
+        async for entry in ijson.items_async(RequestBodyReader(request), "item"):
+            if not isinstance(entry, dict) or not isinstance(entry.get("content", ""), str):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Entry {entry_count + len(batch)} must be an object with string content"
+                )
+            batch.append(entry)
+            if len(batch) >= UPLOAD_BATCH_SIZE:
+                await chroma_indexer.abuild_index_from_data(batch)
+                entry_count += len(batch)
+                batch = []
+        if batch:
+            await chroma_indexer.abuild_index_from_data(batch)
+            entry_count += len(batch)
+    except ijson.JSONError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON after {entry_count} entries: {e}")
+    return {"status": "success", "entries": entry_count}
+
+@app.get("/crawl")
+async def crawl(url: str):
+    """Stream crawl results as a JSON array while pages are analyzed"""
+    return StreamingResponse(stream_crawl_and_analyze_website(url), media_type="application/json")
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))  # Render will set this
     uvicorn.run("app.main:app", host="0.0.0.0", port=port, reload=False)
@@ -1,19 +1,24 @@
+import os
 import streamlit as st
 import asyncio
 import websockets
-import json
+import requests
+import ijson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import threading
-import time
+import socket
+import zlib
 from datetime import datetime
-from typing import List, Dict
-import queue
-import sys
-import io
-import contextlib
+from typing import List, Dict, NamedTuple
+from collections import Counter, OrderedDict, deque
+from itertools import islice
+import logging
+import html
 
-# Completely suppress all threading warnings
-original_stderr = sys.stderr
-sys.stderr = io.StringIO()
+# Keep websockets' connection chatter out of the logs
+logging.getLogger("websockets").setLevel(logging.ERROR)
 
 # Configure Streamlit page
 st.set_page_config(
@@ -23,29 +28,55 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Bounds for per-session WebSocket bookkeeping and chat history
+MESSAGE_QUEUE_SIZE = 256
+MESSAGE_HISTORY_SIZE = 500
+PROCESSED_IDS_LIMIT = 512
+
+class Msg(NamedTuple):
+    """A chat message with its display timestamp already formatted"""
+    role: str
+    content: str
+    ts: str
+
+TIMESTAMP_FORMAT = "%H:%M:%S"
+AVATARS = {"user": "🧑‍💻", "assistant": "🤖"}
+
+def format_timestamp(timestamp: str) -> str:
+    """Format the server's ISO timestamp once, when the message is stored"""
+    try:
+        return datetime.fromisoformat(timestamp).strftime(TIMESTAMP_FORMAT)
+    except ValueError:
+        return timestamp
+
 # Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Bounded history: the oldest messages are evicted once MESSAGE_HISTORY_SIZE is reached
+st.session_state.setdefault("messages", deque(maxlen=MESSAGE_HISTORY_SIZE))
+st.session_state.setdefault("role_counts", Counter())
 if "websocket_client" not in st.session_state:
     st.session_state.websocket_client = None
 if "connected" not in st.session_state:
     st.session_state.connected = False
 if "message_queue" not in st.session_state:
-    st.session_state.message_queue = queue.Queue()
+    # deque.append/popleft are atomic, so the listener thread and the script need no lock
+    st.session_state.message_queue = deque(maxlen=MESSAGE_QUEUE_SIZE)
 if "websocket_thread" not in st.session_state:
     st.session_state.websocket_thread = None
 if "waiting_for_response" not in st.session_state:
     st.session_state.waiting_for_response = False
 if "processed_message_ids" not in st.session_state:
-    st.session_state.processed_message_ids = set()
+    st.session_state.processed_message_ids = OrderedDict()
+if "streaming_reply" not in st.session_state:
+    st.session_state.streaming_reply = ""
+if "ws_loop" not in st.session_state:
+    st.session_state.ws_loop = None
 if "last_user_message" not in st.session_state:
     st.session_state.last_user_message = ""
 
 # WebSocket configuration - Environment aware
+@st.cache_data
 def get_websocket_url():
     """Get the correct WebSocket URL based on environment"""
-    import os
-    
     # For Render deployment
     if os.getenv('RENDER'):
         port = os.getenv('PORT', '10000')  # Render typically uses port 10000
@@ -54,11 +85,90 @@ def get_websocket_url():
     # For local development  
     return "ws://localhost:8000/ws"
 
-WEBSOCKET_URL = get_websocket_url()
+def read_secret(name: str, default: str) -> str:
+    """Look up a value in .streamlit/secrets.toml, falling back when there is no secrets file"""
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:
+        return default
+
+@st.cache_data
+def get_fastapi_url(websocket_url: str) -> str:
+    """HTTP base URL of the same FastAPI server the WebSocket talks to"""
+    return websocket_url.replace("ws", "http", 1).removesuffix("/ws")
+
+# Endpoints are resolved once per run; secrets override the environment-derived defaults
+WEBSOCKET_URL = read_secret("WEBSOCKET_URL", get_websocket_url())
+FASTAPI_URL = read_secret("FASTAPI_URL", get_fastapi_url(WEBSOCKET_URL))
+HEALTH_URL = f"{FASTAPI_URL}/health"
+UPLOAD_URL = f"{FASTAPI_URL}/upload-data-stream"
+
+@st.cache_resource
+def get_session():
+    """Process-wide HTTP session so requests to FastAPI reuse keep-alive connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_probe_session():
+    """Session for health probes: one retry, no backoff, so a dead backend fails fast"""
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=Retry(total=1, backoff_factor=0))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=30)
+def probe_backend(health_url: str):
+    """Return the backend's /health payload, or None if it is unreachable"""
+    try:
+        response = get_probe_session().get(health_url, timeout=2)
+        return orjson.loads(response.content) if response.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        return None
+
+# Uploads are streamed to FastAPI in chunks of this many bytes
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Most recent messages rendered on every poll; earlier ones sit behind a toggle
+CHAT_WINDOW = 50
+
+def gzip_chunks(file):
+    """Gzip a file lazily, UPLOAD_CHUNK_SIZE bytes at a time, for a chunked request body"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in iter(lambda: file.read(UPLOAD_CHUNK_SIZE), b""):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+# Largest upload accepted; keep in sync with MAX_UPLOAD_BYTES in main.py
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+def validate_upload(uploaded_file):
+    """Cheap size and shape checks before anything parses the whole upload"""
+    if uploaded_file.size > MAX_UPLOAD_BYTES:
+        return f"File is {uploaded_file.size / 2**20:.1f} MB; the limit is {MAX_UPLOAD_BYTES // 2**20} MB"
+    try:
+        # Only the first parse event is read
+        _, event, _ = next(ijson.parse(uploaded_file))
+    except (ijson.JSONError, StopIteration):
+        event = None
+    finally:
+        uploaded_file.seek(0)
+    if event != "start_array":
+        return "Expected a JSON array of website entries"
+    return None
+
+# Seconds between queue checks while a bot reply (or the connection) is pending
+POLL_INTERVAL = 0.5
 
 # Add environment detection info
+@st.cache_data
 def get_env_info():
-    import os
     return {
         "render": bool(os.getenv('RENDER')),
         "render_service": os.getenv('RENDER_SERVICE_ID', 'Not set'),
@@ -70,118 +180,188 @@ class WebSocketManager:
     def __init__(self):
         self.websocket = None
         self.running = False
-    
-    @contextlib.contextmanager
-    def suppress_warnings(self):
-        """Context manager to suppress all warnings and stderr"""
-        old_stderr = sys.stderr
-        sys.stderr = io.StringIO()
-        try:
-            yield
-        finally:
-            sys.stderr = old_stderr
+        self.dropped = 0
+
+    def enqueue(self, message_queue, data):
+        """Append to the bounded queue, counting the oldest entry it pushes out"""
+        if len(message_queue) == message_queue.maxlen:
+            self.dropped += 1
+        message_queue.append(data)
+
+    def take_dropped(self) -> int:
+        """Return and reset the number of messages dropped since the last call"""
+        dropped, self.dropped = self.dropped, 0
+        return dropped
     
     async def connect_and_listen(self, message_queue):
         """Connect to WebSocket and listen for messages"""
-        with self.suppress_warnings():
-            try:
-                self.websocket = await websockets.connect(
-                    WEBSOCKET_URL,
-                    ping_interval=20,
-                    ping_timeout=10,
-                    close_timeout=10
-                )
-                self.running = True
-                
-                # Signal successful connection
-                message_queue.put({"type": "connection", "status": "connected"})
-                
-                # Listen for messages continuously
-                while self.running:
-                    try:
-                        # Check if connection is still alive (compatible way)
-                        if hasattr(self.websocket, 'closed'):
-                            if self.websocket.closed:
-                                break
-                        elif hasattr(self.websocket, 'close_code'):
-                            if self.websocket.close_code is not None:
-                                break
-                        
-                        # Wait for incoming messages with longer timeout
-                        message = await asyncio.wait_for(self.websocket.recv(), timeout=5.0)
-                        data = json.loads(message)
-                        
-                        # Debug: print received message
-                        print(f"📨 Streamlit received: {data}")
-                        
-                        # Put message in queue for Streamlit to process
-                        message_queue.put(data)
-                        
-                    except asyncio.TimeoutError:
-                        # This is normal - just continue listening
-                        continue
-                    except websockets.exceptions.ConnectionClosed:
-                        print("🔌 WebSocket connection closed")
-                        break
-                    except json.JSONDecodeError as e:
-                        print(f"❌ JSON decode error: {e}")
-                        continue
-                    except Exception as e:
-                        print(f"❌ Error receiving message: {e}")
-                        break
-                        
-            except Exception as e:
-                print(f"❌ Connection error: {e}")
-                message_queue.put({"type": "connection", "status": "error", "message": str(e)})
-            finally:
-                self.running = False
-                message_queue.put({"type": "connection", "status": "disconnected"})
-                print("🔌 WebSocket listener ended")
-    
+        try:
+            self.websocket = await websockets.connect(
+                WEBSOCKET_URL,
+                ping_interval=20,
+                ping_timeout=10,
+                close_timeout=10,
+                # Bot replies are multi-KB Markdown, which deflates well
+                compression="deflate"
+            )
+            self.set_nodelay()
+            self.running = True
+            
+            # Signal successful connection
+            message_queue.append({"type": "connection", "status": "connected"})
+            
+            # Listen for messages continuously
+            while self.running:
+                try:
+                    # Check if connection is still alive (compatible way)
+                    if hasattr(self.websocket, 'closed'):
+                        if self.websocket.closed:
+                            break
+                    elif hasattr(self.websocket, 'close_code'):
+                        if self.websocket.close_code is not None:
+                            break
+                    
+                    # Wait for incoming messages with longer timeout
+                    message = await asyncio.wait_for(self.websocket.recv(), timeout=5.0)
+                    data = orjson.loads(message)
+                    
+                    # Debug: print received message
+                    print(f"📨 Streamlit received: {data}")
+                    
+                    # Put message in queue for Streamlit to process
+                    self.enqueue(message_queue, data)
+                    
+                except asyncio.TimeoutError:
+                    # This is normal - just continue listening
+                    continue
+                except websockets.exceptions.ConnectionClosed:
+                    print("🔌 WebSocket connection closed")
+                    break
+                except orjson.JSONDecodeError as e:
+                    print(f"❌ JSON decode error: {e}")
+                    continue
+                except Exception as e:
+                    print(f"❌ Error receiving message: {e}")
+                    break
+                    
+        except Exception as e:
+            print(f"❌ Connection error: {e}")
+            message_queue.append({"type": "connection", "status": "error", "message": str(e)})
+        finally:
+            self.running = False
+            message_queue.append({"type": "connection", "status": "disconnected"})
+            print("🔌 WebSocket listener ended")
+
     async def send_message(self, message: str):
         """Send message through WebSocket"""
-        with self.suppress_warnings():
+        try:
+            # Check if connection is still alive (compatible way)
+            connection_alive = True
+            if hasattr(self.websocket, 'closed'):
+                connection_alive = not self.websocket.closed
+            elif hasattr(self.websocket, 'close_code'):
+                connection_alive = self.websocket.close_code is None
+            
+            if self.websocket and connection_alive:
+                message_data = {
+                    "type": "message",
+                    "message": message
+                }
+                await self.websocket.send(orjson.dumps(message_data).decode())
+                print(f"📤 Sent message: {message}")  # Debug line
+            else:
+                raise ConnectionError("WebSocket not connected")
+        except Exception as e:
+            print(f"❌ Error sending message: {e}")
+            # Re-raise so the scheduled future carries the failure back to the UI
+            raise
+
+    def set_nodelay(self):
+        """Disable Nagle's algorithm so small frames are sent immediately"""
+        transport = getattr(self.websocket, "transport", None)
+        sock = transport.get_extra_info("socket") if transport else None
+        if sock is not None:
             try:
-                # Check if connection is still alive (compatible way)
-                connection_alive = True
-                if hasattr(self.websocket, 'closed'):
-                    connection_alive = not self.websocket.closed
-                elif hasattr(self.websocket, 'close_code'):
-                    connection_alive = self.websocket.close_code is None
-                
-                if self.websocket and connection_alive:
-                    message_data = {
-                        "type": "message",
-                        "message": message
-                    }
-                    await self.websocket.send(json.dumps(message_data))
-                    print(f"📤 Sent message: {message}")  # Debug line
-                else:
-                    print("❌ WebSocket not connected")
-            except Exception as e:
-                print(f"❌ Error sending message: {e}")
-    
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError as e:
+                print(f"⚠️ Could not set TCP_NODELAY: {e}")
+
     def stop(self):
         """Stop the WebSocket connection"""
         self.running = False
 
-def websocket_worker(message_queue):
+def websocket_worker(manager: WebSocketManager, loop: asyncio.AbstractEventLoop, message_queue):
     """Worker function to run WebSocket in separate thread"""
+    # session_state is only touched from the script thread; the worker gets what it needs
     def run():
-        with contextlib.redirect_stderr(io.StringIO()):
-            manager = WebSocketManager()
-            st.session_state.websocket_manager = manager
-            asyncio.run(manager.connect_and_listen(message_queue))
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(manager.connect_and_listen(message_queue))
+        finally:
+            loop.close()
     
     return run
 
+# Transient notices fade out in the browser, so no sleep or rerun is needed to clear them
+FLASH_STYLE = """<style>
+@keyframes flash-fade { 0%, 75% { opacity: 1; } 100% { opacity: 0; visibility: hidden; } }
+.flash { animation: flash-fade 3s forwards; padding: 0.5rem 0.75rem; border-radius: 0.5rem; }
+.flash-success { background: rgba(33, 195, 84, 0.1); color: rgb(23, 114, 51); }
+.flash-warning { background: rgba(255, 189, 69, 0.2); color: rgb(146, 108, 5); }
+</style>"""
+
+def flash(message: str, kind: str = "success"):
+    """Show a notice in an st.empty slot that fades out client-side"""
+    st.empty().markdown(
+        f'{FLASH_STYLE}<div class="flash flash-{kind}">{html.escape(message)}</div>',
+        unsafe_allow_html=True
+    )
+
+def add_message(message: Msg):
+    """Append to the bounded history, keeping role counts in step with evictions"""
+    messages = st.session_state.messages
+    role_counts = st.session_state.role_counts
+    if len(messages) == messages.maxlen:
+        role_counts[messages[0].role] -= 1
+    messages.append(message)
+    role_counts[message.role] += 1
+
+def report_send_failure(message_queue):
+    """Done-callback for a scheduled send that queues an event if it raised"""
+    def callback(fut):
+        if not fut.cancelled() and fut.exception() is not None:
+            message_queue.append({"type": "send_error", "message": str(fut.exception())})
+    return callback
+
+def remember_message_id(message_id: str) -> bool:
+    """Record a message id in the bounded LRU; returns False if it was already seen"""
+    processed_ids = st.session_state.processed_message_ids
+    if message_id in processed_ids:
+        processed_ids.move_to_end(message_id)
+        return False
+    processed_ids[message_id] = None
+    if len(processed_ids) > PROCESSED_IDS_LIMIT:
+        processed_ids.popitem(last=False)
+    return True
+
 def process_message_queue():
     """Process messages from the WebSocket queue"""
     messages_processed = False
     
-    while not st.session_state.message_queue.empty():
+    # Drain everything queued so far in one pass; the listener may keep appending
+    batch = []
+    message_queue = st.session_state.message_queue
+    while message_queue:
+        batch.append(message_queue.popleft())
+
+    # The listener drops the oldest messages when we fall behind; surface that as its own event
+    manager = st.session_state.get("websocket_manager")
+    dropped = manager.take_dropped() if manager else 0
+    if dropped:
+        batch.insert(0, {"type": "backpressure", "dropped": dropped})
+    
+    for data in batch:
         try:
-            data = st.session_state.message_queue.get_nowait()
             print(f"🔄 Processing queue message: {data}")  # Debug line
             
             if data.get("type") == "connection":
@@ -191,13 +371,23 @@ def process_message_queue():
                     messages_processed = True
                 elif status == "disconnected":
                     st.session_state.connected = False
+                    st.session_state.waiting_for_response = False
+                    st.session_state.streaming_reply = ""
                     messages_processed = True
                 elif status == "error":
                     st.session_state.connected = False
-                    st.error(f"Connection error: {data.get('message', 'Unknown error')}")
+                    st.session_state.waiting_for_response = False
+                    st.session_state.streaming_reply = ""
+                    # A toast survives the full rerun that the status change triggers
+                    st.toast(f"Connection error: {data.get('message', 'Unknown error')}", icon="❌")
                     messages_processed = True
             
-            elif data.get("type") == "message":
+            elif data.get("type") == "token":
+                # Partial reply; replaced by the full text when "done" arrives
+                st.session_state.streaming_reply += data.get("delta", "")
+                messages_processed = True
+
+            elif data.get("type") in ("message", "done"):
                 sender = data.get("sender")
                 message_content = data.get("message", "")
                 timestamp = data.get("timestamp", datetime.now().isoformat())
@@ -207,47 +397,98 @@ def process_message_queue():
                 
                 print(f"👤 Message from {sender}: {message_content}")  # Debug line
                 
-                if sender == "bot" and message_id not in st.session_state.processed_message_ids:
+                if sender == "bot" and remember_message_id(message_id):
                     # Only add bot messages that we haven't seen before
-                    message = {
-                        "role": "assistant",
-                        "content": message_content,
-                        "timestamp": timestamp,
-                        "id": message_id
-                    }
-                    st.session_state.messages.append(message)
-                    st.session_state.processed_message_ids.add(message_id)
+                    add_message(Msg("assistant", message_content, format_timestamp(timestamp)))
+                    st.session_state.streaming_reply = ""
                     st.session_state.waiting_for_response = False
                     messages_processed = True
                     print("✅ Bot message added to chat")  # Debug line
                 elif sender == "bot":
                     print(f"🔄 Skipping duplicate message: {message_id}")
             
+            elif data.get("type") == "send_error":
+                st.session_state.waiting_for_response = False
+                st.toast(f"Failed to send message: {data.get('message', 'Unknown error')}", icon="❌")
+                messages_processed = True
+
+            elif data.get("type") == "backpressure":
+                flash(f"⚠️ Falling behind: skipped {data['dropped']} older updates", "warning")
+
             elif data.get("type") == "typing":
                 # Handle typing indicator if needed
                 pass
             
-        except queue.Empty:
-            break
         except Exception as e:
             print(f"❌ Error processing message: {e}")
-            break
+            continue
     
     return messages_processed
 
-async def send_message_to_websocket(message: str):
-    """Send message through WebSocket"""
-    if hasattr(st.session_state, 'websocket_manager') and st.session_state.websocket_manager:
-        try:
-            await st.session_state.websocket_manager.send_message(message)
-            return True
-        except Exception as e:
-            st.error(f"Failed to send message: {e}")
-            return False
-    return False
+def connect():
+    """Start the WebSocket listener thread for this session"""
+    # Repeat clicks within the probe's TTL are answered from cache
+    if probe_backend(HEALTH_URL) is None:
+        st.toast(f"Backend unreachable at {FASTAPI_URL}", icon="❌")
+        return
+    # Clear any previous connection state
+    st.session_state.connected = False
+    # Poll until the connection status and welcome message arrive
+    st.session_state.waiting_for_response = True
+
+    # Start WebSocket client in a separate thread
+    manager = WebSocketManager()
+    st.session_state.websocket_manager = manager
+    # The listener's loop stays alive for the connection; sends are scheduled onto it
+    st.session_state.ws_loop = asyncio.new_event_loop()
+    worker = websocket_worker(manager, st.session_state.ws_loop, st.session_state.message_queue)
+    websocket_thread = threading.Thread(target=worker, daemon=True)
+    st.session_state.websocket_thread = websocket_thread
+    websocket_thread.start()
+    st.toast("Connecting...", icon="🔄")
+
+def disconnect():
+    if hasattr(st.session_state, 'websocket_manager'):
+        st.session_state.websocket_manager.stop()
+    st.session_state.connected = False
+    st.toast("Disconnected", icon="⚠️")
+
+def clear_chat():
+    st.session_state.messages.clear()
+    st.session_state.role_counts.clear()
+    st.toast("Chat history cleared", icon="🧹")
+
+# Chat input is handled before anything renders, so the new message and the
+# updated stats show in this same run without a follow-up st.rerun()
+if prompt := st.chat_input("Type your message here...", disabled=not st.session_state.connected):
+    if not st.session_state.connected:
+        st.error("Please connect to the WebSocket first!")
+    else:
+        # Check if this is the same message as the last one
+        if prompt.strip() != st.session_state.last_user_message:
+            # Add user message to chat
+            add_message(Msg("user", prompt, datetime.now().strftime(TIMESTAMP_FORMAT)))
+            st.session_state.last_user_message = prompt.strip()
+            st.session_state.waiting_for_response = True
+            
+            # Hand the send to the listener's event loop without waiting on it; a failure
+            # comes back through the message queue like any other event
+            try:
+                fut = asyncio.run_coroutine_threadsafe(
+                    st.session_state.websocket_manager.send_message(prompt),
+                    st.session_state.ws_loop
+                )
+                fut.add_done_callback(report_send_failure(st.session_state.message_queue))
+            except Exception as e:
+                st.session_state.waiting_for_response = False
+                st.error(f"Failed to send message: {e}")
+        else:
+            print(f"🔄 Skipping duplicate user message: {prompt}")
 
 # Sidebar
-with st.sidebar:
+@st.fragment
+def render_sidebar():
+    """Sidebar widgets; interacting with them reruns only this fragment"""
     st.title("🤖 RAG Chat Settings")
     
     # Connection status
@@ -266,44 +507,55 @@ with st.sidebar:
     else:
         st.info(f"🔗 Ready to connect")
     
-    # Connect/Disconnect buttons
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        if st.button("Connect", disabled=st.session_state.connected):
-            # Clear any previous connection state
-            st.session_state.connected = False
-            
-            # Start WebSocket client in a separate thread
-            worker = websocket_worker(st.session_state.message_queue)
-            websocket_thread = threading.Thread(target=worker, daemon=True)
-            st.session_state.websocket_thread = websocket_thread
-            websocket_thread.start()
-            
-            st.info("🔄 Connecting...")
-            time.sleep(1)
-            st.rerun()
-    
-    with col2:
-        if st.button("Disconnect", disabled=not st.session_state.connected):
-            if hasattr(st.session_state, 'websocket_manager'):
-                st.session_state.websocket_manager.stop()
-            st.session_state.connected = False
-            st.warning("⚠️ Disconnected")
-            st.rerun()
+    # Connect/Disconnect buttons share one form, so the pair is sent as a single element
+    with st.form("connection", border=False):
+        # Callbacks run before the script reruns, so every widget below already sees the new state
+        connect_clicked = st.form_submit_button("Connect", disabled=st.session_state.connected, on_click=connect)
+        disconnect_clicked = st.form_submit_button("Disconnect", disabled=not st.session_state.connected, on_click=disconnect)
     
     st.divider()
     
     # Chat statistics
     st.write("**Chat Statistics**")
-    st.metric("Total Messages", len(st.session_state.messages))
+    # Counts are kept up to date on append, so no pass over the history is needed
+    role_counts = st.session_state.role_counts
+    st.markdown(
+        f"💬 **{role_counts.total()}** messages &nbsp;·&nbsp; "
+        f"{AVATARS['user']} {role_counts['user']} &nbsp;·&nbsp; {AVATARS['assistant']} {role_counts['assistant']}"
+    )
     
     # Clear chat button
-    if st.button("Clear Chat History"):
-        st.session_state.messages = []
+    clear_clicked = st.button("Clear Chat History", on_click=clear_chat)
+
+    # These change the chat area and its polling, which only a full app run redraws
+    if connect_clicked or disconnect_clicked or clear_clicked:
         st.rerun()
     
     st.divider()
+
+    # Upload crawled website data to index
+    st.write("**Website Data**")
+    uploaded_file = st.file_uploader("Upload website JSON", type=["json"])
+    if uploaded_file is not None and st.button("Build Index"):
+        problem = validate_upload(uploaded_file)
+        if problem:
+            st.error(f"❌ {problem}")
+        else:
+            try:
+                # The raw bytes go straight to the server, which parses them once and reports the count
+                with st.spinner("Indexing website data..."):
+                    response = get_session().post(
+                        UPLOAD_URL,
+                        data=gzip_chunks(uploaded_file),
+                        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                        timeout=(5, 300)
+                    )
+                    response.raise_for_status()
+                flash(f"✅ Indexed {orjson.loads(response.content).get('entries', 0)} entries")
+            except (requests.RequestException, ValueError) as e:
+                st.error(f"❌ Upload failed: {e}")
+
+    st.divider()
     
     # Instructions
     st.write("**Instructions**")
@@ -321,77 +573,56 @@ with st.sidebar:
         st.write(f"**WebSocket URL:** {WEBSOCKET_URL}")
         st.write(f"**Render Service:** {env_info['render_service']}")
         st.write(f"**Streamlit Port:** {env_info['streamlit_port']}")
-        st.write(f"**Queue Size:** {st.session_state.message_queue.qsize()}")
+        st.write(f"**Queue Size:** {len(st.session_state.message_queue)}")
         
         if st.button("Test Connection"):
-            st.info("Check debug output below for connection attempts")
+            health = probe_backend(HEALTH_URL)
+            if health is None:
+                st.error(f"❌ Backend unreachable at {FASTAPI_URL}")
+            else:
+                flash(f"✅ Backend {health.get('status', 'unknown')} at {FASTAPI_URL}")
+                st.write(f"**Active Connections:** {health.get('active_connections', 0)}")
+
+with st.sidebar:
+    render_sidebar()
 
 # Main chat interface
 st.title("🤖 Website RAG Chat Assistant")
 st.write("Ask me anything about the website content!")
 
-# Process any pending messages and check if we need to rerun
-should_rerun = process_message_queue()
+def render_message(message: Msg):
+    with st.chat_message(message.role, avatar=AVATARS[message.role]):
+        st.markdown(message.content)
+        st.caption(f"Sent at: {message.ts}")
 
-# Display chat messages
-for i, message in enumerate(st.session_state.messages):
-    with st.chat_message(message["role"]):
-        st.write(message["content"])
-        if "timestamp" in message:
-            st.caption(f"Sent at: {message['timestamp']}")
+def render_chat():
+    """Drain the WebSocket queue and display chat messages"""
+    state_before = (st.session_state.connected, st.session_state.waiting_for_response)
+    process_message_queue()
 
-# Chat input
-if prompt := st.chat_input("Type your message here...", disabled=not st.session_state.connected):
-    if not st.session_state.connected:
-        st.error("Please connect to the WebSocket first!")
-    else:
-        # Check if this is the same message as the last one
-        if prompt.strip() != st.session_state.last_user_message:
-            # Add user message to chat
-            user_message = {
-                "role": "user",
-                "content": prompt,
-                "timestamp": datetime.now().isoformat()
-            }
-            st.session_state.messages.append(user_message)
-            st.session_state.last_user_message = prompt.strip()
-            st.session_state.waiting_for_response = True
-            
-            # Send message through WebSocket
-            def send_message():
-                async def send():
-                    with contextlib.redirect_stderr(io.StringIO()):
-                        await send_message_to_websocket(prompt)
-                
-                def run_send():
-                    with contextlib.redirect_stderr(io.StringIO()):
-                        asyncio.run(send())
-                
-                thread = threading.Thread(target=run_send, daemon=True)
-                thread.start()
-            
-            send_message()
-            
-            # Force rerun to show user message immediately
-            st.rerun()
-        else:
-            print(f"🔄 Skipping duplicate user message: {prompt}")
+    messages = st.session_state.messages
+    older_count = max(0, len(messages) - CHAT_WINDOW)
+    # Older history is only built when asked for; an expander would still render it every poll
+    # Constant label and key: the widget identity must not change as history grows
+    if older_count and st.toggle("Show earlier messages", key="show_older_messages"):
+        for message in islice(messages, older_count):
+            render_message(message)
+    for message in islice(messages, older_count, None):
+        render_message(message)
+
+    # Show the reply as it streams in; it becomes a regular message once complete
+    if st.session_state.streaming_reply:
+        with st.chat_message("assistant", avatar=AVATARS["assistant"]):
+            st.write(st.session_state.streaming_reply + "▌")
 
-# Auto-refresh to check for new messages
-if st.session_state.connected:
-    # Check for new messages more frequently
-    new_messages = process_message_queue()
-    if new_messages:
-        print("🔄 New messages found, rerunning...")
+    # Connection status and chat input live outside this fragment, so redraw the
+    # whole app when they change; this also stops polling once the reply is in
+    if (st.session_state.connected, st.session_state.waiting_for_response) != state_before:
         st.rerun()
-    
-    # Auto refresh every 2 seconds when connected
-    time.sleep(2)
-    st.rerun()
+
+# Only the chat fragment reruns while polling, and only while a reply is pending
+st.fragment(render_chat, run_every=POLL_INTERVAL if st.session_state.waiting_for_response else None)()
 
 # Footer
 st.divider()
 st.caption("Powered by FastAPI WebSocket and Streamlit | RAG Chat Assistant")
-
-# Restore stderr at the end
-sys.stderr = original_stderr
\ No newline at end of file
@@ -1,14 +1,17 @@
 # website_analyzer_tool.py - Single tool version of your web analyzer
 import os
-import json
+import orjson
+import xxhash
 import re
 import asyncio
 import logging
-from typing import List, Dict, Any
-from urllib.parse import urljoin, urlparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Dict, Any
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, Page
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage
 from langchain.agents import Tool
@@ -16,6 +19,45 @@ from langchain.agents import Tool
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Keep the browser warm between crawls and persist cookies across restarts
+BROWSER_IDLE_TIMEOUT = 60
+BROWSER_STATE_FILE = os.path.join(os.path.dirname(__file__), "browser_state.json")
+
+# Max concurrent page fetches against a single host
+HOST_CONCURRENCY = 8
+
+# Upper bound (ms) on waiting for the network to go quiet after DOMContentLoaded
+NETWORK_IDLE_TIMEOUT = 2500
+
+# Only text matters, so skip downloading everything else
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+CHROMIUM_ARGS = ["--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage", "--blink-settings=imagesEnabled=false"]
+
+# Pages classified per LLM call, and how much of each page the model sees
+SITE_TYPE_BATCH_SIZE = 10
+SITE_TYPE_CONTENT_CHARS = 2000
+# Leading characters of a page that identify it in the site-type cache
+SITE_TYPE_KEY_CHARS = 3000
+
+# Boilerplate tags dropped before extracting page text
+STRIP_TAGS = {"script", "style", "nav", "footer", "aside"}
+
+# JSON array in an LLM reply, possibly wrapped in prose or code fences
+_JSON_LIST_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+def same_site_prefixes(url: str) -> tuple:
+    """URL prefixes that match http(s) links on the same host as url"""
+    domain = urlparse(url).netloc.lower()
+    # Browser-resolved hrefs always have a path, so the trailing slash rules out lookalike hosts
+    return (f"http://{domain}/", f"https://{domain}/")
+
+def extract_text(html: str) -> str:
+    """Visible page text with boilerplate removed and whitespace collapsed"""
+    soup = BeautifulSoup(html, 'lxml')
+    for el in soup.find_all(STRIP_TAGS):
+        el.decompose()
+    return " ".join(soup.get_text(" ", strip=True).split())
+
 class Analyzer:
     def __init__(self):
         load_dotenv()
@@ -23,59 +65,168 @@ class Analyzer:
         if not key:
             raise ValueError("Missing GEMINI_API_KEY in .env")
         self.llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=key)
+        self.playwright = None
         self.browser = None
         self.context = None
+        self._loop = None
+        self._refcount = 0
+        self._lock = asyncio.Lock()
+        self._idle_close_task = None
+        self._host_semaphores = {}
+        # Site types keyed by xxh64 of the page's leading text, shared by all crawls
+        self._site_type_cache = {}
+        self._site_type_lock = asyncio.Lock()
 
     async def start_browser(self):
-        pw = await async_playwright().start()
-        self.browser = await pw.chromium.launch(headless=True)
-        self.context = await self.browser.new_context()
+        """Acquire the shared browser, launching it only if it is not already running"""
+        if self._loop is not asyncio.get_running_loop():
+            # Playwright objects are bound to the loop that created them
+            self._reset_browser_state()
+            self._loop = asyncio.get_running_loop()
+            self._lock = asyncio.Lock()
+            self._site_type_lock = asyncio.Lock()
+            self._host_semaphores = {}
+        async with self._lock:
+            if self._idle_close_task:
+                self._idle_close_task.cancel()
+                self._idle_close_task = None
+            self._refcount += 1
+            if self.browser:
+                return
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+            storage_state = BROWSER_STATE_FILE if os.path.exists(BROWSER_STATE_FILE) else None
+            self.context = await self.browser.new_context(storage_state=storage_state)
+            await self.context.route("**/*", self._block_heavy_resources)
+
+    @staticmethod
+    async def _block_heavy_resources(route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def release_browser(self, idle_timeout: float = BROWSER_IDLE_TIMEOUT):
+        """Release the shared browser; it closes after idle_timeout seconds without new users"""
+        async with self._lock:
+            self._refcount = max(0, self._refcount - 1)
+            if self._refcount == 0 and self.browser:
+                self._idle_close_task = asyncio.create_task(self._close_when_idle(idle_timeout))
+
+    async def _close_when_idle(self, delay: float):
+        await asyncio.sleep(delay)
+        async with self._lock:
+            if self._refcount == 0:
+                self._idle_close_task = None
+                await self.close_browser()
 
     async def close_browser(self):
+        idle_close_task = self._idle_close_task
+        if idle_close_task and idle_close_task is not asyncio.current_task():
+            idle_close_task.cancel()
         if self.context:
+            try:
+                # Keep cookies/local storage for the next browser session
+                await self.context.storage_state(path=BROWSER_STATE_FILE)
+            except Exception as e:
+                logger.warning(f"Could not save browser state: {e}")
             await self.context.close()
         if self.browser:
             await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+        self._reset_browser_state()
+
+    def _reset_browser_state(self):
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self._refcount = 0
+        self._idle_close_task = None
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(HOST_CONCURRENCY)
+        return self._host_semaphores[host]
+
+    async def _fetch(self, url: str, timeout: int) -> tuple:
+        """Load a page in the shared context and return (final_url, html, links)"""
+        async with self._host_semaphore(url):
+            page = await self.context.new_page()
+            try:
+                await page.goto(url, wait_until='domcontentloaded', timeout=timeout)
+                try:
+                    # Give client-rendered content a chance to settle without a fixed sleep
+                    await page.wait_for_load_state("networkidle", timeout=NETWORK_IDLE_TIMEOUT)
+                except PlaywrightTimeoutError:
+                    pass
+                # Resolve every href in the browser in a single round-trip
+                links = await page.eval_on_selector_all("a[href]", "els => els.map(e => e.href)")
+                return page.url, await page.content(), links
+            finally:
+                await page.close()
 
     async def validate_url(self, url: str) -> bool:
         parsed = urlparse(url)
         return parsed.scheme in ["http", "https"]
 
     async def get_site_type(self, text: str) -> str:
+        return (await self.get_site_types_batch([text]))[0]
+
+    async def get_site_types_batch(self, texts: List[str]) -> List[str]:
+        """Classify many pages with one LLM call per SITE_TYPE_BATCH_SIZE uncached pages"""
+        keys = [xxhash.xxh64(text[:SITE_TYPE_KEY_CHARS]).hexdigest() for text in texts]
+        # Held across the LLM calls so concurrent crawls never classify the same page twice
+        async with self._site_type_lock:
+            pending = {}
+            for key, text in zip(keys, texts):
+                if key not in self._site_type_cache:
+                    pending.setdefault(key, text)
+
+            pending_items = list(pending.items())
+            batches = [pending_items[i:i + SITE_TYPE_BATCH_SIZE] for i in range(0, len(pending_items), SITE_TYPE_BATCH_SIZE)]
+            classified = await asyncio.gather(*(self._classify_batch([text for _, text in batch]) for batch in batches))
+            for batch, site_types in zip(batches, classified):
+                for (key, _), site_type in zip(batch, site_types):
+                    self._site_type_cache[key] = site_type
+
+            return [self._site_type_cache[key] for key in keys]
+
+    async def _classify_batch(self, texts: List[str]) -> List[str]:
+        pages = [{"idx": i, "content": text[:SITE_TYPE_CONTENT_CHARS]} for i, text in enumerate(texts)]
         for attempt in range(3):
             prompt = f"""
-            Analyze the following website content and determine the primary type of website.
-            Return JSON: {{"site_type": "..."}}
-            Content: {text[:3000]}
+            Analyze each of the following website pages and determine the primary type of website for each.
+            Return a JSON list: [{{"idx": ..., "site_type": "..."}}, ...]
+            Pages: {orjson.dumps(pages).decode()}
             """
             try:
-                logger.info(f"[LLM CALL][SiteType] Attempt {attempt+1}")
-                response = await asyncio.to_thread(self.llm.invoke, [HumanMessage(content=prompt)])
-                match = re.search(r"\{.*\}", response.content.strip(), re.DOTALL)
-                return json.loads(match.group()).get("site_type", "other") if match else "other"
+                logger.info(f"[LLM CALL][SiteType] {len(texts)} pages, attempt {attempt+1}")
+                response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+                match = _JSON_LIST_RE.search(response.content.strip())
+                site_types = ["other"] * len(texts)
+                for item in (orjson.loads(match.group()) if match else []):
+                    idx = item.get("idx")
+                    if isinstance(idx, int) and 0 <= idx < len(texts):
+                        site_types[idx] = item.get("site_type", "other")
+                return site_types
             except Exception as e:
-                logger.warning(f"LLM error in get_site_type: {e}")
+                logger.warning(f"LLM error in get_site_types_batch: {e}")
                 await asyncio.sleep(2)
-        return "other"
-    
-    async def analyze_url(self, url: str) -> List[Dict[str, str]]:
+        return ["other"] * len(texts)
+
+    async def analyze_url(self, url: str, classify: bool = True) -> List[Dict[str, str]]:
+        """Fetch a page and a few of its subpages; subpages share the page's site_type"""
         results = []
         try:
             if not await self.validate_url(url):
                 return []
 
-            page = await self.context.new_page()
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await page.wait_for_timeout(1500)
-
-            final_url = page.url
-            html = await page.content()
-            soup = BeautifulSoup(html, 'html.parser')
-            for tag in ["script", "style", "nav", "footer", "aside"]:
-                for el in soup.find_all(tag): el.decompose()
-            text = re.sub(r"\s+", " ", soup.get_text(" ", strip=True))
+            final_url, html, links = await self._fetch(url, timeout=30000)
+            text = extract_text(html)
 
-            site_type = await self.get_site_type(text)
+            site_type = await self.get_site_type(text) if classify else None
 
             results.append({
                 "URL": final_url,
@@ -84,127 +235,153 @@ class Analyzer:
                 "errors": None
             })
 
-            subpages = await self.extract_subpages(page, final_url, site_type)
+            subpages = await self.extract_subpages(links, final_url, site_type)
             results.extend(subpages)
-
-            await page.close()
         except Exception as e:
             logger.warning(f"Failed to analyze {url}: {e}")
         return results
 
-    async def extract_subpages(self, page: Page, base_url: str, site_type: str, max_subpages: int = 5) -> List[Dict[str, str]]:
+    async def extract_subpages(self, hrefs: List[str], base_url: str, site_type: str, max_subpages: int = 5) -> List[Dict[str, str]]:
         subpages = []
         try:
-            anchors = await page.query_selector_all("a[href]")
-            links = set()
-            domain = urlparse(base_url).netloc
-            for a in anchors:
-                href = await a.get_attribute("href")
-                if not href:
-                    continue
-                full_url = urljoin(base_url, href)
-                parsed = urlparse(full_url)
-                if parsed.netloc == domain and full_url != base_url:
-                    links.add(full_url)
+            prefixes = same_site_prefixes(base_url)
+            links = {u for u in hrefs if u.startswith(prefixes) and u != base_url}
 
-            for link in list(links)[:max_subpages]:
+            async def fetch_sub(link: str):
                 try:
-                    sub_page = await self.context.new_page()
-                    await sub_page.goto(link, wait_until='domcontentloaded', timeout=15000)
-                    await sub_page.wait_for_timeout(1000)
-                    html = await sub_page.content()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    for tag in ["script", "style", "nav", "footer", "aside"]:
-                        for el in soup.find_all(tag): el.decompose()
-                    text = re.sub(r"\s+", " ", soup.get_text(" ", strip=True))
-                    subpages.append({
+                    _, sub_html, _ = await self._fetch(link, timeout=15000)
+                    text = extract_text(sub_html)
+                    return {
                         "URL": link,
                         "site_type": site_type,
                         "content": text,
                         "errors": None
-                    })
-                    await sub_page.close()
+                    }
                 except Exception as sub_err:
                     logger.warning(f"Subpage error ({link}): {sub_err}")
-                    continue
+                    return None
+
+            fetched = await asyncio.gather(*(fetch_sub(link) for link in list(links)[:max_subpages]))
+            subpages = [entry for entry in fetched if entry]
         except Exception as e:
             logger.warning(f"Error extracting subpages from {base_url}: {e}")
         return subpages
 
     async def crawl_site(self, start_url: str, max_pages: int = 50) -> List[str]:
-        to_visit = [start_url]
-        visited = set()
+        parsed_start = urlparse(start_url)
+        if parsed_start.scheme not in ("http", "https"):
+            return []
+        prefixes = same_site_prefixes(start_url)
+        # Every URL is enqueued at most once, so the frontier never holds duplicates
+        to_visit = deque([start_url])
+        queued = {start_url}
+        fetched = 0
         collected_urls = []
-        while to_visit and len(visited) < max_pages:
-            current_url = to_visit.pop(0)
-            if current_url in visited or not await self.validate_url(current_url):
-                continue
-            try:
-                page = await self.context.new_page()
-                await page.goto(current_url, wait_until='domcontentloaded', timeout=20000)
-                await page.wait_for_timeout(1000)
-                final_url = page.url
-                html = await page.content()
-                await page.close()
-                visited.add(current_url)
+        # Crawl breadth-first one generation at a time, fetching each generation concurrently
+        while to_visit and fetched < max_pages:
+            generation = [to_visit.popleft() for _ in range(min(len(to_visit), max_pages - fetched))]
+            fetched += len(generation)
+
+            results = await asyncio.gather(
+                *(self._fetch(url, timeout=20000) for url in generation),
+                return_exceptions=True
+            )
+            for current_url, result in zip(generation, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Error crawling {current_url}: {result}")
+                    continue
+                final_url, _, links = result
                 collected_urls.append(final_url)
-                soup = BeautifulSoup(html, 'html.parser')
-                domain = urlparse(start_url).netloc
-                for a in soup.find_all("a", href=True):
-                    href = a.get("href")
-                    abs_url = urljoin(final_url, href)
-                    parsed = urlparse(abs_url)
-                    if parsed.netloc == domain and abs_url not in visited:
+                for abs_url in links:
+                    if abs_url not in queued and abs_url.startswith(prefixes):
+                        queued.add(abs_url)
                         to_visit.append(abs_url)
-            except Exception as e:
-                logger.warning(f"Error crawling {current_url}: {e}")
-                continue
         return list(set(collected_urls))
 
 # Global analyzer instance
 analyzer = Analyzer()
-async def async_crawl_and_analyze_website(url: str) -> str:
+
+
+async def _classify_groups(crawler: Analyzer, groups: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+    """Classify each group's top-level page in one batch; subpages inherit their parent's type"""
+    site_types = await crawler.get_site_types_batch([entries[0]["content"] for entries in groups])
+    classified = []
+    for entries, site_type in zip(groups, site_types):
+        for entry in entries:
+            entry["site_type"] = site_type
+        classified.extend(entries)
+    return classified
+
+async def stream_crawl_and_analyze_website(url: str, crawler: Analyzer = None) -> AsyncIterator[bytes]:
+    """Crawl and analyze a site, yielding a JSON array one page entry at a time"""
+    crawler = crawler or analyzer
+    await crawler.start_browser()
     try:
-        await analyzer.start_browser()
         logger.info(f"Crawling entire site: {url}")
-        urls = await analyzer.crawl_site(url, max_pages=50)
+        urls = await crawler.crawl_site(url, max_pages=50)
         logger.info(f"Found {len(urls)} URLs to analyze")
 
-        if not urls:
-            return "No URLs found during crawling"
-
-        results = []
-        for i, crawled_url in enumerate(urls):
-            logger.info(f"Processing {i+1}/{len(urls)}: {crawled_url}")
-            entries = await analyzer.analyze_url(crawled_url)
-            results.extend(entries)
-            await asyncio.sleep(1)
-
-        await analyzer.close_browser()
+        yield b"["
+        success_count = failure_count = 0
+        separator = b""
+        pending = []
+        # Per-host semaphores in _fetch keep this polite without a fixed sleep between pages
+        tasks = [crawler.analyze_url(crawled_url, classify=False) for crawled_url in urls]
+        for done, next_entries in enumerate(asyncio.as_completed(tasks), start=1):
+            entries = await next_entries
+            if entries:
+                pending.append(entries)
+            # Emit pages as soon as a full classification batch is ready
+            if len(pending) < SITE_TYPE_BATCH_SIZE and done < len(tasks):
+                continue
+            for entry in await _classify_groups(crawler, pending):
+                if entry.get("errors"):
+                    failure_count += 1
+                else:
+                    success_count += 1
+                yield separator + orjson.dumps(entry)
+                separator = b","
+            pending = []
+        yield b"]"
 
-        success_count = sum(1 for r in results if not r.get("errors"))
-        failure_count = len(results) - success_count
         logger.info(f"Analysis complete. {success_count} succeeded, {failure_count} failed.")
+    finally:
+        await crawler.release_browser()
 
-        return json.dumps(results, indent=2, ensure_ascii=False)
+async def async_crawl_and_analyze_website(url: str, crawler: Analyzer = None) -> str:
+    try:
+        result = b"".join([chunk async for chunk in stream_crawl_and_analyze_website(url, crawler)]).decode()
     except Exception as e:
-        try:
-            await analyzer.close_browser()
-        except:
-            pass
         return f"Error crawling and analyzing {url}: {str(e)}"
+    return result if result != "[]" else "No URLs found during crawling"
 
 # Sync fallback (only use if you want direct calls outside LangChain)
+async def _crawl_once(url: str) -> str:
+    """Crawl with a private analyzer whose browser is closed before the temporary loop ends"""
+    # The shared analyzer belongs to the server's loop; binding it to this loop would reset
+    # its browser under any crawl still running there
+    crawler = Analyzer()
+    try:
+        return await async_crawl_and_analyze_website(url, crawler)
+    finally:
+        await crawler.close_browser()
 
+def sync_crawl(url: str) -> str:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_crawl_once(url))
+    # Blocking on the running loop from its own thread would deadlock, so run on a fresh loop elsewhere
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, _crawl_once(url)).result()
 
 def create_website_extracter_tool():
     return Tool(
         name="CrawlAndAnalyzeWebsite",
-        func=lambda url: async_crawl_and_analyze_websitec(url),  # Only used outside async contexts
-        coroutine=lambda url : async_crawl_and_analyze_website(url),  # Used inside LangChain agent
+        func=sync_crawl,  # Only used outside async contexts
+        coroutine=async_crawl_and_analyze_website,  # Used inside LangChain agent
         description=(
             "Crawl and analyze a full website starting from a given URL. "
             "Returns JSON content with extracted data, page content, and classifications."
         )
     )
-    
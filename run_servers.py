@@ -1,50 +1,41 @@
-import subprocess
 import sys
 import time
 import os
 import threading
 
-def run_fastapi():
-    """Run FastAPI server"""
+import uvicorn
+from streamlit.web import cli as stcli
+
+def start_fastapi():
+    """Run FastAPI in a background thread of this process"""
     # Use Render's PORT environment variable, fallback to 8000 for local
-    port = os.getenv('PORT', '8000')
+    port = int(os.getenv('PORT', '8000'))
     host = '0.0.0.0'
-    
+
     print(f"🚀 Starting FastAPI on {host}:{port}")
-    
-    # Change to app directory if it exists
-    if os.path.exists('app'):
-        os.chdir('app')
-    
-    cmd = [
-        sys.executable, '-m', 'uvicorn', 
-        'main:app', 
-        '--host', host, 
-        '--port', port,
-        '--reload'
-    ]
-    subprocess.run(cmd)
+
+    # No --reload here: the reloader forks a second interpreter
+    config = uvicorn.Config('app.main:app', host=host, port=port, reload=False, workers=1)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return server, thread
 
 def run_streamlit():
     """Run Streamlit app"""
-    # Wait for FastAPI to start
-    time.sleep(5)
-    
     # For Render, we need to use a different port for Streamlit
     streamlit_port = '8501'
-    if os.getenv('RENDER'):
-        # On Render, we'll run Streamlit on a different port
-        streamlit_port = '8501'
-    
+
     print(f"🎨 Starting Streamlit on port {streamlit_port}")
-    
-    cmd = [
-        sys.executable, '-m', 'streamlit', 'run', 
-        'streamlit_app.py',  # Make sure this filename matches
+
+    # Streamlit installs signal handlers, so it has to own the main thread
+    sys.argv = [
+        'streamlit', 'run',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'streamlit_app.py'),
         '--server.port', streamlit_port,
         '--server.address', '0.0.0.0'
     ]
-    subprocess.run(cmd)
+    sys.exit(stcli.main())
 
 if __name__ == "__main__":
     # Check if we're on Render
@@ -53,10 +44,13 @@ if __name__ == "__main__":
         print(f"📍 PORT env var: {os.getenv('PORT', 'Not set')}")
     else:
         print("💻 Running locally")
-    
-    # Start FastAPI in a separate thread
-    fastapi_thread = threading.Thread(target=run_fastapi, daemon=True)
-    fastapi_thread.start()
-    
-    # Start Streamlit in main thread
-    run_streamlit()
\ No newline at end of file
+
+    server, fastapi_thread = start_fastapi()
+
+    # Wait until FastAPI is actually listening instead of sleeping a fixed 5s
+    while not server.started and fastapi_thread.is_alive():
+        time.sleep(0.1)
+    if not server.started:
+        sys.exit("❌ FastAPI failed to start")
+
+    run_streamlit()